@@ -2,17 +2,16 @@
 #
 #----------------------------------------------------------------------
 
-import argparse
-import json
 import os
-from   pathlib import Path
 import sys
-import textwrap
+
+from   cmdsdb import args_key, open_commands, query_commands
 
 _my_name = os.path.basename(__file__)
 _my_input_default = 'cmds.json'
 _my_output_default = 'build.ninja'
 _my_exe_default = 'D:/wrk/clangberget/scripts/t7.py'
+_my_conflicts_default = 'conflicts.txt'
 
 DESCRIPTION = f"""
 Make ninja file from {_my_input_default} input
@@ -25,6 +24,9 @@ Examples:
 
 #-------------------------------------------------------------------------------
 def parse_arguments():
+    import argparse
+    import textwrap
+
     parser = argparse.ArgumentParser(_my_name,
         formatter_class=argparse.RawDescriptionHelpFormatter,
         description=textwrap.dedent(DESCRIPTION),
@@ -37,13 +39,25 @@ def parse_arguments():
         help='be more verbose')
     add('-i', '--input', metavar='INFILE',
         default=_my_input_default,
-        help='input file (.json)')
+        help='input file (.json or snapshot)')
     add('-o', '--output', metavar='OUTFILE',
         default=_my_output_default,
         help='output file')
     add('-e', '--executable', metavar='THE APP',
         default=_my_exe_default,
         help='called executable')
+    add('--project', metavar='PROJECT',
+        help='only the commands of this project')
+    add('--config', metavar='CONFIGURATION',
+        help='only the commands of this configuration, e.g. Release or x64')
+    add('--source', metavar='SOURCE-GLOB',
+        help='only the commands of source files matching this glob')
+    add('--define', metavar='DEFINE',
+        help='only the commands with this define, NAME or NAME=VALUE')
+    add('-c', '--conflicts', metavar='CONFLICTFILE',
+        default=_my_conflicts_default,
+        help='summary of outputs that got conflicting rules, only written '
+             'when there are any')
 
     options = parser.parse_args()
     if not os.path.exists(options.input):
@@ -52,13 +66,6 @@ def parse_arguments():
         sys.exit(3)
     return options
 
-#-------------------------------------------------------------------------------
-def open_as_json(file_name):
-    with open(file_name, 'r', encoding='utf-8') as json_file:
-        content = json.load(json_file)
-
-    return content
-
 #-------------------------------------------------------------------------------
 def ninja_escape(instring):
     outstring = ""
@@ -87,10 +94,61 @@ def ninja_escape(instring):
 
     return outstring
 
+#-------------------------------------------------------------------------------
+def get_out_file(src_file, args):
+    out_file = os.path.basename(src_file) + '.indx'
+    out_dir = args.get('out_dir')
+    if out_dir:
+        out_file = os.path.join(out_dir, out_file)
+    return out_file
+
+#-------------------------------------------------------------------------------
+def rule_order(key):
+    # Sort on the source path, then on the normalized arguments
+    src_file, normalized_args = key
+    return src_file, repr(normalized_args)
+
+#-------------------------------------------------------------------------------
+def dedup_invocations(json_input):
+    '''Identical rules for an output are merged. For conflicting ones the rule
+    that sorts first on source path and then arguments is kept, so the
+    result does not depend on the order of the input'''
+    candidates = {}
+    for invocation in json_input:
+        for src_file, args in invocation.items():
+            if src_file == 'null':
+                print(f'The source file cannot be null idiot!')
+                continue
+            out_file = get_out_file(src_file, args)
+            key = (src_file, args_key(args))
+            # An identical duplicate is silently merged here
+            candidates.setdefault(out_file, {}).setdefault(key, (src_file, args))
+
+    rules = {}
+    conflicts = {}
+    for out_file, rule_candidates in candidates.items():
+        keys = sorted(rule_candidates, key=rule_order)
+        rules[out_file] = rule_candidates[keys[0]]
+        if len(keys) > 1:
+            conflicts[out_file] = [rule_candidates[key] for key in keys[1:]]
+    return rules, conflicts
+
+#-------------------------------------------------------------------------------
+def save_conflicts(file_name, rules, conflicts):
+    with open(file_name, 'w', encoding='utf-8') as outfile:
+        for out_file, others in conflicts.items():
+            src_file, args = rules[out_file]
+            outfile.write(f'{out_file}\n')
+            outfile.write(f'  kept:    {src_file} {args}\n')
+            for src_file, args in others:
+                outfile.write(f'  skipped: {src_file} {args}\n')
+
 #-------------------------------------------------------------------------------
 def generate_ninja_file(json_input, compiler_tool, ninja_file, options):
     print("I am in generate_ninja_file")
 
+    rules, conflicts = dedup_invocations(json_input)
+
     f = open(ninja_file, "w")
     f.write("ninja_required_version=1.3\n\n")
     f.write("rule COMPILE\n")
@@ -98,43 +156,30 @@ def generate_ninja_file(json_input, compiler_tool, ninja_file, options):
     f.write("  deps = gcc\n")
     f.write("  command = $CMDLINE --dependency $out.d\n\n")
 
-    outputs_generated = {}
+    for out_file, (src_file, args) in rules.items():
+        argument_line = f'{compiler_tool} --source_file {src_file}'
+        for define in args['defines']:
+            argument_line += f' -D{define}'
+        for include in args['includes']:
+            argument_line += f' --include {include}'
+        argument_line += f' --output_file {out_file}'
 
-    for invocation in json_input:
-        for src_file in invocation.keys():
-            if src_file == 'null':
-                print(f'The source file cannot be null idiot!')
-                continue
-            out_file = os.path.basename(src_file) + '.indx'
-            argument_line = f'{compiler_tool} --source_file {src_file}'
-            args = invocation[src_file]
-
-            for define in args['defines']:
-                argument_line += f' -D{define}'
-            for include in args['includes']:
-                argument_line += f' --include {include}'
-
-            out_dir = args.get('out_dir')
-            if out_dir:
-                out_file = os.path.join(out_dir, out_file)
-            argument_line += f' --output_file {out_file}'
-
-            if out_file in outputs_generated:
-                print(f'{out_file} already has rule from {outputs_generated[out_file]}')
-                print(f'  and now gets one from {invocation[src_file]}')
-                continue  # Skip this one
-            else:
-                outputs_generated[out_file] = invocation[src_file]
-            out_file = ninja_escape(out_file)
-            src_file = ninja_escape(src_file)
-            f.write("build " + out_file + ": COMPILE " + src_file + "\n")
-
-            argument_line = ninja_escape(argument_line)
-            f.write("  CMDLINE=" + argument_line)
-            f.write("\n\n")
+        out_file = ninja_escape(out_file)
+        src_file = ninja_escape(src_file)
+        f.write("build " + out_file + ": COMPILE " + src_file + "\n")
+
+        argument_line = ninja_escape(argument_line)
+        f.write("  CMDLINE=" + argument_line)
+        f.write("\n\n")
 
     f.close()
 
+    if conflicts:
+        save_conflicts(options.conflicts, rules, conflicts)
+        print(f'{len(conflicts)} outputs got conflicting rules, see {options.conflicts}')
+    else:
+        print(f'No outputs got conflicting rules')
+
     return ninja_file
 
 #-------------------------------------------------------------------------------
@@ -142,11 +187,16 @@ def main(options):
     ret_val = 0
 
     infile = options.input
-    json_input = open_as_json(infile)
     calling_tool = options.executable
     ninja_file = options.output
 
-    ninja_file = generate_ninja_file(json_input, calling_tool, ninja_file, options)
+    with open_commands(infile) as commands:
+        json_input = query_commands(commands,
+                                    project=options.project,
+                                    source=options.source,
+                                    define=options.define,
+                                    configuration=options.config)
+        ninja_file = generate_ninja_file(json_input, calling_tool, ninja_file, options)
 
     print(f'Results saved in {ninja_file}')
 
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+#
+#----------------------------------------------------------------------
+#
+# Binary snapshot of the command database (cmds.json) that is opened with
+# mmap and decoded lazily, and the query layer on top of it.
+#
+# Layout, all integers are little endian uint32:
+#   header          magic, version, counts (see _my_header)
+#   str_offsets     n_strings + 1 offsets into the string blob
+#   argset_offsets  2 * n_argsets + 1 offsets into arg_ids, argset i has
+#                   defines in [2i, 2i+1) and includes in [2i+1, 2i+2)
+#   argset_out_dir  n_argsets string ids, _my_no_string for no out_dir
+#   argset_tlog     n_argsets string ids, _my_no_string for no tlog
+#   arg_ids         string ids of all defines and includes
+#   tu_source       n_tus string ids of the source files
+#   tu_argset       n_tus argset ids
+#   index_keys      n_index_keys string ids of the query keys
+#   index_offsets   n_index_keys + 1 offsets into index_tus
+#   index_tus       sorted tu ids for each query key
+#   blob            utf-8 encoded strings
+#----------------------------------------------------------------------
+
+from   array import array
+import mmap
+import os
+import struct
+import sys
+
+_my_magic = b'TLOGCDB\0'
+_my_version = 3
+_my_header = struct.Struct('<8s8I')
+_my_no_string = 0xFFFFFFFF
+_my_glob_chars = '*?['
+
+#-------------------------------------------------------------------------------
+def _split_path(path):
+    # The tlogs are from Windows, so split on both kinds of separators
+    return [part for part in path.replace('\\', '/').split('/') if part]
+
+#-------------------------------------------------------------------------------
+def _unquote(path):
+    if path.startswith('"') and path.endswith('"'):
+        return path[1:-1]
+    return path
+
+#-------------------------------------------------------------------------------
+def _tlog_dir_index(parts):
+    # The proj.tlog directory, not the CL.command.1.tlog file
+    for index in range(len(parts) - 1, -1, -1):
+        part = parts[index].lower()
+        if part.endswith('.tlog') and not part.startswith('cl.'):
+            return index
+    return None
+
+#-------------------------------------------------------------------------------
+def _is_shortened(name):
+    # MSBuild shortens long project names to <name>.<8 hex digits>.tlog
+    return len(name) > 9 and name[-9] == '.' and \
+        all(char in '0123456789abcdefABCDEF' for char in name[-8:])
+
+#-------------------------------------------------------------------------------
+def tlog_project(tlog):
+    '''The project of CL.command.1.tlog in .../Release/proj.tlog'''
+    parts = _split_path(tlog)
+    index = _tlog_dir_index(parts)
+    if index is None:
+        return None
+    name = parts[index][:-len('.tlog')]
+    if _is_shortened(name):
+        name = name[:-9]
+    return name
+
+#-------------------------------------------------------------------------------
+def tlog_has_project(tlog, project):
+    parts = _split_path(tlog)
+    index = _tlog_dir_index(parts)
+    if index is None:
+        return False
+    name = parts[index][:-len('.tlog')].lower()
+    project = project.lower()
+    if _is_shortened(name):
+        # Only the start of the project name is left
+        return project.startswith(name[:-9])
+    return project == name
+
+#-------------------------------------------------------------------------------
+def tlog_configurations(tlog):
+    '''Every directory above proj.tlog, the layout of IntDir is up to the
+    project so $(Configuration) and $(Platform) can be at any level'''
+    parts = _split_path(tlog)
+    index = _tlog_dir_index(parts)
+    if index is None:
+        return []
+    # Leave out the drive
+    return [part for part in parts[:index] if not part.endswith(':')]
+
+#-------------------------------------------------------------------------------
+def args_key(args):
+    '''Normalized arguments of a translation unit, used to find duplicates'''
+    defines = args['defines']
+    names = [define.split('=', 1)[0] for define in defines]
+    if len(set(names)) == len(names):
+        # Defines are a set, include order matters
+        defines = sorted(defines)
+    # else the last /D of a name wins in cl, so keep the order
+    return (tuple(defines),
+            tuple(args['includes']),
+            args.get('out_dir'))
+
+#-------------------------------------------------------------------------------
+def _split_source(path):
+    path = _unquote(path).replace('\\', '/')
+    source_dir, _, source_name = path.rpartition('/')
+    return source_dir, source_name
+
+#-------------------------------------------------------------------------------
+def _is_absolute(path):
+    # C:/dir or /dir, after the backslashes are turned into slashes
+    return path.startswith('/') or (len(path) > 2 and path[1] == ':' and path[2] == '/')
+
+#-------------------------------------------------------------------------------
+def source_dir_key(path):
+    return 'dir:' + os.path.normcase(_split_source(path)[0])
+
+#-------------------------------------------------------------------------------
+def index_keys(source_file, args):
+    '''The query keys a translation unit is found under'''
+    keys = [source_dir_key(source_file)]
+    for define in args['defines']:
+        keys.append('define:' + define.split('=', 1)[0])
+    # Projects and configurations are matched against the few distinct tlogs
+    tlog = args.get('tlog')
+    if tlog:
+        keys.append('tlog:' + tlog)
+    return keys
+
+#-------------------------------------------------------------------------------
+def _to_bytes(values):
+    the_array = array('I', values)
+    if sys.byteorder == 'big':
+        the_array.byteswap()
+    return the_array.tobytes()
+
+#-------------------------------------------------------------------------------
+def save_snapshot(file_name, command_lines):
+    strings = {}
+    def string_id(the_string):
+        index = strings.get(the_string)
+        if index is None:
+            index = len(strings)
+            strings[the_string] = index
+        return index
+
+    argsets = {}
+    postings = {}
+    argset_offsets = [0]
+    argset_out_dir = []
+    argset_tlog = []
+    argset_keys = []
+    arg_ids = []
+    tu_source = []
+    tu_argset = []
+    for commands in command_lines:
+        for source_file, args in commands.items():
+            key = (tuple(args['defines']), tuple(args['includes']),
+                   args.get('out_dir'), args.get('tlog'))
+            argset = argsets.get(key)
+            if argset is None:
+                argset = len(argsets)
+                argsets[key] = argset
+                arg_ids.extend(string_id(define) for define in key[0])
+                argset_offsets.append(len(arg_ids))
+                arg_ids.extend(string_id(include) for include in key[1])
+                argset_offsets.append(len(arg_ids))
+                if key[2] is None:
+                    argset_out_dir.append(_my_no_string)
+                else:
+                    argset_out_dir.append(string_id(key[2]))
+                if key[3] is None:
+                    argset_tlog.append(_my_no_string)
+                else:
+                    argset_tlog.append(string_id(key[3]))
+                # The keys but the source dir are the same for the argset
+                argset_keys.append(index_keys('', args)[1:])
+            tu = len(tu_source)
+            tu_source.append(string_id(source_file))
+            tu_argset.append(argset)
+            postings.setdefault(source_dir_key(source_file), []).append(tu)
+            for index_key in argset_keys[argset]:
+                postings.setdefault(index_key, []).append(tu)
+
+    index_key_ids = []
+    index_offsets = [0]
+    index_tus = []
+    for index_key, tus in postings.items():
+        index_key_ids.append(string_id(index_key))
+        # A define may be given twice on one command line
+        index_tus.extend(sorted(set(tus)))
+        index_offsets.append(len(index_tus))
+
+    str_offsets = [0]
+    blob = bytearray()
+    for the_string in strings:
+        blob += the_string.encode('utf-8')
+        str_offsets.append(len(blob))
+
+    with open(file_name, 'wb') as outfile:
+        outfile.write(_my_header.pack(_my_magic, _my_version, len(strings),
+                                      len(argsets), len(arg_ids),
+                                      len(tu_source), len(index_key_ids),
+                                      len(index_tus), len(blob)))
+        for section in (str_offsets, argset_offsets, argset_out_dir,
+                        argset_tlog, arg_ids, tu_source, tu_argset,
+                        index_key_ids, index_offsets, index_tus):
+            outfile.write(_to_bytes(section))
+        outfile.write(blob)
+
+#-------------------------------------------------------------------------------
+def is_snapshot(file_name):
+    with open(file_name, 'rb') as infile:
+        return infile.read(len(_my_magic)) == _my_magic
+
+#-------------------------------------------------------------------------------
+class CommandSnapshot:
+    '''Read-only view of a snapshot, iterates like the cmds.json list but with
+    one {source_file: args} dict per translation unit'''
+
+    def __init__(self, file_name):
+        self._file = open(file_name, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = view = memoryview(self._map)
+        (magic, version, n_strings, n_argsets, n_arg_ids, n_tus,
+         n_index_keys, n_index_tus, blob_len) = _my_header.unpack_from(view)
+        if magic != _my_magic or version != _my_version:
+            self.close()
+            raise ValueError(f'{file_name} is not a version {_my_version} command snapshot')
+
+        offset = _my_header.size
+        def section(count):
+            nonlocal offset
+            start = offset
+            offset += count * 4
+            the_section = view[start:offset].cast('I')
+            if sys.byteorder == 'big':
+                the_section = array('I', the_section)
+                the_section.byteswap()
+            return the_section
+
+        self._str_offsets = section(n_strings + 1)
+        self._argset_offsets = section(2 * n_argsets + 1)
+        self._argset_out_dir = section(n_argsets)
+        self._argset_tlog = section(n_argsets)
+        self._arg_ids = section(n_arg_ids)
+        self._tu_source = section(n_tus)
+        self._tu_argset = section(n_tus)
+        self._index_keys = section(n_index_keys)
+        self._index_offsets = section(n_index_keys + 1)
+        self._index_tus = section(n_index_tus)
+        self._blob = view[offset:offset + blob_len]
+        self._strings = {}
+        self._argsets = {}
+        self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        # Views must be released before the map can be closed
+        for name in ('_str_offsets', '_argset_offsets', '_argset_out_dir',
+                     '_argset_tlog', '_arg_ids', '_tu_source', '_tu_argset',
+                     '_index_keys', '_index_offsets', '_index_tus', '_blob',
+                     '_view'):
+            the_view = self.__dict__.pop(name, None)
+            if isinstance(the_view, memoryview):
+                the_view.release()
+        self._map.close()
+        self._file.close()
+
+    def __len__(self):
+        return len(self._tu_source)
+
+    def string(self, index):
+        the_string = self._strings.get(index)
+        if the_string is None:
+            start = self._str_offsets[index]
+            end = self._str_offsets[index + 1]
+            the_string = str(self._blob[start:end], 'utf-8')
+            self._strings[index] = the_string
+        return the_string
+
+    def source(self, tu):
+        return self.string(self._tu_source[tu])
+
+    def args(self, tu):
+        # Translation units sharing a flag set share the same dict
+        argset = self._tu_argset[tu]
+        args = self._argsets.get(argset)
+        if args is None:
+            offsets = self._argset_offsets
+            start, middle, end = offsets[2 * argset:2 * argset + 3]
+            arg_ids = self._arg_ids
+            out_dir = self._argset_out_dir[argset]
+            tlog = self._argset_tlog[argset]
+            args = {
+                'defines': [self.string(i) for i in arg_ids[start:middle]],
+                'includes': [self.string(i) for i in arg_ids[middle:end]],
+                'out_dir': None if out_dir == _my_no_string else self.string(out_dir),
+            }
+            if tlog != _my_no_string:
+                args['tlog'] = self.string(tlog)
+            self._argsets[argset] = args
+        return args
+
+    def _load_index(self):
+        if self._index is None:
+            # Only the keys are read here, the postings stay in the map
+            self._index = {self.string(key_id): position
+                           for position, key_id in enumerate(self._index_keys)}
+        return self._index
+
+    def index_keys(self):
+        return self._load_index().keys()
+
+    def lookup(self, index_key):
+        '''Sorted tu ids found under index_key'''
+        self._load_index()
+        position = self._index.get(index_key)
+        if position is None:
+            return []
+        start = self._index_offsets[position]
+        end = self._index_offsets[position + 1]
+        return self._index_tus[start:end]
+
+    def items(self, tus=None):
+        if tus is None:
+            tus = range(len(self))
+        for tu in tus:
+            yield self.source(tu), self.args(tu)
+
+    def __iter__(self):
+        for source_file, args in self.items():
+            yield {source_file: args}
+
+#-------------------------------------------------------------------------------
+def open_commands(file_name):
+    '''Open either a snapshot or a cmds.json, use it in a with statement so
+    that the snapshot gets closed'''
+    if is_snapshot(file_name):
+        return CommandSnapshot(file_name)
+    import json
+
+    with open(file_name, 'r', encoding='utf-8') as json_file:
+        content = json.load(json_file)
+
+    return CommandList(content)
+
+#-------------------------------------------------------------------------------
+class CommandList:
+    '''The same lookups over a loaded cmds.json, indexed in memory'''
+
+    def __init__(self, command_lines):
+        self._tus = [(source_file, args)
+                     for commands in command_lines
+                     for source_file, args in commands.items()]
+        self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        pass
+
+    def __len__(self):
+        return len(self._tus)
+
+    def source(self, tu):
+        return self._tus[tu][0]
+
+    def args(self, tu):
+        return self._tus[tu][1]
+
+    def _load_index(self):
+        if self._index is None:
+            self._index = {}
+            for tu, (source_file, args) in enumerate(self._tus):
+                for key in index_keys(source_file, args):
+                    tus = self._index.setdefault(key, [])
+                    if not tus or tus[-1] != tu:
+                        tus.append(tu)
+        return self._index
+
+    def index_keys(self):
+        return self._load_index().keys()
+
+    def lookup(self, index_key):
+        return self._load_index().get(index_key, [])
+
+    def items(self, tus=None):
+        if tus is None:
+            return iter(self._tus)
+        return (self._tus[tu] for tu in tus)
+
+    def __iter__(self):
+        for source_file, args in self.items():
+            yield {source_file: args}
+
+#-------------------------------------------------------------------------------
+def _union(commands, tlogs):
+    tus = set()
+    for tlog in tlogs:
+        tus.update(commands.lookup('tlog:' + tlog))
+    return sorted(tus)
+
+#-------------------------------------------------------------------------------
+def query_commands(commands, project=None, source=None, define=None,
+                   configuration=None):
+    '''The {source_file: args} of the translation units matching all the given
+    criteria, commands is a CommandSnapshot or a loaded cmds.json'''
+    if not any((project, source, define, configuration)):
+        return iter(commands)
+    if not isinstance(commands, (CommandSnapshot, CommandList)):
+        commands = CommandList(commands)
+
+    candidates = []
+    if project or configuration:
+        tlogs = [key[len('tlog:'):] for key in commands.index_keys()
+                 if key.startswith('tlog:')]
+    if project:
+        matching = [tlog for tlog in tlogs if tlog_has_project(tlog, project)]
+        candidates.append(_union(commands, matching))
+    if configuration:
+        configuration = configuration.lower()
+        matching = [tlog for tlog in tlogs
+                    if configuration in (part.lower() for part in tlog_configurations(tlog))]
+        candidates.append(_union(commands, matching))
+    if define:
+        candidates.append(commands.lookup('define:' + define.split('=', 1)[0]))
+    source_dir = None
+    if source:
+        source_dir, source_name = _split_source(source)
+        # Only an absolute directory can be looked up, scan for the rest
+        if not _is_absolute(source_dir) or \
+           any(char in source_dir for char in _my_glob_chars):
+            source_dir = None
+        else:
+            candidates.append(commands.lookup(source_dir_key(source)))
+
+    # Start from the smallest posting list, or all tus for a pure glob
+    if candidates:
+        candidates.sort(key=len)
+        tus = candidates[0]
+        for other in candidates[1:]:
+            other = set(other)
+            tus = [tu for tu in tus if tu in other]
+    else:
+        tus = range(len(commands))
+
+    def matches(tu):
+        if source:
+            import fnmatch
+
+            source_file = _unquote(commands.source(tu)).replace('\\', '/')
+            pattern = source.replace('\\', '/')
+            if source_dir is not None or '/' not in pattern:
+                source_file = _split_source(source_file)[1]
+                pattern = source_name
+            elif not _is_absolute(pattern):
+                pattern = '*/' + pattern
+            source_file = os.path.normcase(source_file)
+            pattern = os.path.normcase(pattern)
+            if not fnmatch.fnmatchcase(source_file, pattern):
+                return False
+        if define and '=' in define:
+            if define not in commands.args(tu)['defines']:
+                return False
+        return True
+
+    return ({source_file: args}
+            for source_file, args in commands.items(tu for tu in tus if matches(tu)))
@@ -2,19 +2,26 @@
 #
 #----------------------------------------------------------------------
 
-import argparse
-import json
 import os
-from   pathlib import Path
-import re
+import signal
 import subprocess
 import sys
-import textwrap
+import time
+
+from   progress import Progress
 
 _my_name = os.path.basename(__file__)
 _my_input_default = 'invocations.json'
 _my_output_default = 'outputs.txt'
 
+# Statuses that come from the exception and not from the job, worth a retry
+_my_transient_statuses = ('timeout', 'not started')
+# The shell reports a job killed by signal N as 128 + N
+_my_exit_signal_base = 128
+# What RLIMIT_CPU (and the hard limit of RLIMIT_AS on some systems) kills with
+_my_limit_signals = [getattr(signal, name) for name in ('SIGKILL', 'SIGXCPU')
+                     if hasattr(signal, name)]
+
 DESCRIPTION = """
 Make commandlines from tlogs.json input
 """
@@ -26,6 +33,9 @@ Examples:
 
 #-------------------------------------------------------------------------------
 def parse_arguments():
+    import argparse
+    import textwrap
+
     parser = argparse.ArgumentParser(_my_name,
         formatter_class=argparse.RawDescriptionHelpFormatter,
         description=textwrap.dedent(DESCRIPTION),
@@ -47,8 +57,29 @@ def parse_arguments():
     add('-o', '--output', metavar='OUTFILE',
         default=_my_output_default,
         help='output file')
+    add('-j', '--jobs', metavar='N', type=int,
+        default=1,
+        help='number of invocations run in parallel')
+    add('-m', '--metrics', metavar='METRICSFILE',
+        help='periodically write Prometheus style metrics to this file')
+    add('-t', '--timeout', metavar='SECONDS', type=float,
+        help='wall-clock limit per invocation, the job is killed after that')
+    add('-r', '--retries', metavar='N', type=int,
+        default=0,
+        help='retries for timed out or not started invocations')
+    add('--retry-delay', metavar='SECONDS', type=float,
+        default=1.0,
+        help='delay before the first retry, doubled for each retry')
+    add('--max-memory', metavar='MB', type=int,
+        help='address space limit (RLIMIT_AS) per invocation')
+    add('--max-cpu', metavar='SECONDS', type=int,
+        help='CPU time limit (RLIMIT_CPU) per invocation')
 
     options = parser.parse_args()
+    if (options.max_memory or options.max_cpu) and os.name == 'nt':
+        print(f'Resource limits are not supported here, ignoring them')
+        options.max_memory = None
+        options.max_cpu = None
     if not os.path.exists(options.input):
         print(f'Input file {options.input} not found')
         parser.print_help()
@@ -61,6 +92,8 @@ def ccp():
     try:
         return ccp.codepage
     except AttributeError:
+        import re
+
         reply = os.popen('cmd /c CHCP').read()
         cp = re.match(r'^.*:\s+(\d*)$', reply)
         if cp:
@@ -70,26 +103,81 @@ def ccp():
         return ccp.codepage
 
 #-------------------------------------------------------------------------------
-def run_process(command, do_check, extra_dir=os.getcwd(), as_text=True):
+def limit_command(command, max_memory, max_cpu):
+    # Let the shell set the limits, preexec_fn is not safe with the job threads
+    limits = ''
+    if max_memory:
+        limits += f'ulimit -v {max_memory * 1024} || exit; '
+    if max_cpu:
+        limits += f'ulimit -t {max_cpu} || exit; '
+    return limits + command
+
+#-------------------------------------------------------------------------------
+def exit_status(exit_code, limited):
+    '''Status of a job that ran to its end with a non-zero exit code'''
+    if exit_code < 0:
+        signal_number = -exit_code
+    elif _my_exit_signal_base < exit_code <= _my_exit_signal_base + 64:
+        signal_number = exit_code - _my_exit_signal_base
+    else:
+        return 'failed'
+    if limited and signal_number in _my_limit_signals:
+        return 'limited'
+    return 'signal'
+
+#-------------------------------------------------------------------------------
+def kill_process_tree(process):
+    # shell=True, so the real job is a child of the shell
+    if os.name == 'nt':
+        subprocess.run(f'taskkill /F /T /PID {process.pid}',
+                       stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    process.kill()
+
+#-------------------------------------------------------------------------------
+def run_process(command, do_check, extra_dir=os.getcwd(), as_text=True,
+                timeout=None, max_memory=None, max_cpu=None):
     exit_code = 0
+    status = 'ok'
     try:
         encoding_used = None
         if as_text:
             encoding_used = ccp()
 
-        status = subprocess.run(command,
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE,
-                                text=as_text,
-                                shell=True,
-                                encoding=encoding_used,  # See https://bugs.python.org/issue27179
-                                check=do_check)
-        if status.returncode == 0:
-            reply = status.stdout
+        extra_args = {}
+        shell_command = command
+        if os.name != 'nt':
+            extra_args['start_new_session'] = True
+            if max_memory or max_cpu:
+                shell_command = limit_command(command, max_memory, max_cpu)
+
+        process = subprocess.Popen(shell_command,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE,
+                                   text=as_text,
+                                   shell=True,
+                                   encoding=encoding_used,  # See https://bugs.python.org/issue27179
+                                   **extra_args)
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            kill_process_tree(process)
+            stdout, stderr = process.communicate()
+            raise subprocess.TimeoutExpired(command, timeout, stdout, stderr)
+        if do_check and process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, command,
+                                                stdout, stderr)
+        if process.returncode == 0:
+            reply = stdout
         else:
-            reply = status.stdout
-            reply += status.stderr
-        exit_code = status.returncode
+            reply = stdout
+            reply += stderr
+        exit_code = process.returncode
 
     except Exception as e:
         reply = '\n-start of exception-\n'
@@ -100,21 +188,51 @@ def run_process(command, do_check, extra_dir=os.getcwd(), as_text=True):
         reply += f'type:  {type(e)}\n'
         reply += f'text:  {e}\n'
         reply += '\n-end of exception-\n'
-        reply += f'stdout: {e.stdout}\n'
-        reply += f'stderr: {e.stderr}\n'
+        reply += f'stdout: {getattr(e, "stdout", None)}\n'
+        reply += f'stderr: {getattr(e, "stderr", None)}\n'
         if as_text == False:
             reply = reply.encode('utf-8')
-        exit_code = 3
+        # Jobs that timed out or never started have no exit code of their own
+        if isinstance(e, subprocess.TimeoutExpired):
+            exit_code = None
+            status = 'timeout'
+        elif isinstance(e, OSError):
+            exit_code = None
+            status = 'not started'
+        elif isinstance(e, subprocess.CalledProcessError):
+            exit_code = e.returncode
+            status = exit_status(exit_code, bool(max_memory or max_cpu))
+        else:
+            exit_code = 3
+            status = 'failed'
 
-    return reply, exit_code
+    return reply, exit_code, status
+
+#-------------------------------------------------------------------------------
+def run_with_retries(command, options):
+    attempt = 0
+    while True:
+        reply, exit_code, status = run_process(command, True,
+                                               timeout=options.timeout,
+                                               max_memory=options.max_memory,
+                                               max_cpu=options.max_cpu)
+        if status not in _my_transient_statuses or attempt >= options.retries:
+            break
+        time.sleep(options.retry_delay * 2 ** attempt)
+        attempt += 1
+    return reply, exit_code, status, attempt
 
 #-------------------------------------------------------------------------------
 def save_as_json(file_name, content):
+    import json
+
     with open(file_name, 'w', encoding='utf-8') as outfile:
         json.dump(content, outfile, indent=2, ensure_ascii=False)
 
 #-------------------------------------------------------------------------------
 def open_as_json(file_name):
+    import json
+
     with open(file_name, 'r', encoding='utf-8') as json_file:
         content = json.load(json_file)
 
@@ -122,18 +240,52 @@ def open_as_json(file_name):
 #
 '''
         command = 'git pull'
-        reply, exit_code = run_process(command, True, git_dir)
+        reply, exit_code, status = run_process(command, True, git_dir)
 
 '''
 #-------------------------------------------------------------------------------
 def process_cmds(invocation_file, options):
+    from concurrent.futures import ThreadPoolExecutor
+
     content = open_as_json(invocation_file)
-    output_lines = []
-    for invocation in content:
-        if options.verbose:
-            print(f'python {invocation}')
-        reply, exit_code = run_process(invocation, True)
-        output_lines.append(reply)
+    limits = {}
+    for limit in ('timeout', 'max_memory', 'max_cpu'):
+        if getattr(options, limit):
+            limits[limit] = getattr(options, limit)
+
+    with Progress('invocater', len(content), options.quiet,
+                  options.metrics) as progress:
+        def run_one(invocation):
+            progress.started()
+            if options.verbose:
+                print(f'python {invocation}')
+            reply, exit_code, status, retries = run_with_retries(invocation, options)
+            progress.finished(failed=status != 'ok')
+            result = {}
+            result['command'] = invocation
+            result['status'] = status
+            result['exit_code'] = exit_code
+            result['retries'] = retries
+            result['limits'] = limits
+            result['output'] = reply
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, options.jobs)) as executor:
+            output_lines = list(executor.map(run_one, content))
+
+    statuses = [result['status'] for result in output_lines]
+    no_timeouts = statuses.count('timeout')
+    if no_timeouts:
+        print(f'{no_timeouts} invocations killed after {options.timeout} seconds')
+    no_limited = statuses.count('limited')
+    if no_limited:
+        print(f'{no_limited} invocations killed by a resource limit')
+    no_signals = statuses.count('signal')
+    if no_signals:
+        print(f'{no_signals} invocations killed by a signal')
+    no_failed = statuses.count('failed') + statuses.count('not started')
+    if no_failed:
+        print(f'{no_failed} invocations failed')
     return output_lines
 
 #-------------------------------------------------------------------------------
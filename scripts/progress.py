@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+#
+#----------------------------------------------------------------------
+
+import os
+import sys
+import threading
+import time
+
+_my_tty_interval = 0.5
+_my_log_interval = 10.0
+_my_metrics_interval = 5.0
+
+#-------------------------------------------------------------------------------
+def format_duration(seconds):
+    seconds = int(seconds)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if hours:
+        return f'{hours}:{minutes:02}:{seconds:02}'
+    return f'{minutes}:{seconds:02}'
+
+#-------------------------------------------------------------------------------
+class Progress:
+    '''Status line and optional Prometheus text file, refreshed by a
+    background thread so the workers only bump counters'''
+
+    def __init__(self, stage, total, quiet=False, metrics_file=None):
+        self.stage = stage
+        self.total = total
+        self.quiet = quiet
+        self.metrics_file = metrics_file
+        self.done = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.start_time = time.monotonic()
+        self.is_tty = sys.stderr.isatty()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_status = 0.0
+        self._last_metrics = 0.0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.finish()
+
+    def start(self):
+        if self.quiet and not self.metrics_file:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, failed=False):
+        with self._lock:
+            self.in_flight -= 1
+            self.done += 1
+            if failed:
+                self.failed += 1
+
+    def finish(self):
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self._report(final=True)
+
+    def snapshot(self):
+        with self._lock:
+            done, failed, in_flight = self.done, self.failed, self.in_flight
+        elapsed = time.monotonic() - self.start_time
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - done) / rate if rate > 0 else None
+        return done, failed, in_flight, elapsed, rate, eta
+
+    def status_line(self):
+        done, failed, in_flight, elapsed, rate, eta = self.snapshot()
+        line = f'{self.stage}: {done}/{self.total} done'
+        if failed:
+            line += f', {failed} failed'
+        line += f', {rate:.1f}/s, {in_flight} in flight'
+        line += f', elapsed {format_duration(elapsed)}'
+        if eta is not None and done < self.total:
+            line += f', ETA {format_duration(eta)}'
+        return line
+
+    def write_metrics(self):
+        done, failed, in_flight, elapsed, rate, eta = self.snapshot()
+        labels = f'{{stage="{self.stage}"}}'
+        lines = [
+            '# TYPE tlog_harvester_items_expected gauge',
+            f'tlog_harvester_items_expected{labels} {self.total}',
+            '# TYPE tlog_harvester_items_done_total counter',
+            f'tlog_harvester_items_done_total{labels} {done}',
+            '# TYPE tlog_harvester_items_failed_total counter',
+            f'tlog_harvester_items_failed_total{labels} {failed}',
+            '# TYPE tlog_harvester_items_in_flight gauge',
+            f'tlog_harvester_items_in_flight{labels} {in_flight}',
+            '# TYPE tlog_harvester_items_per_second gauge',
+            f'tlog_harvester_items_per_second{labels} {rate:.3f}',
+            '# TYPE tlog_harvester_elapsed_seconds gauge',
+            f'tlog_harvester_elapsed_seconds{labels} {elapsed:.3f}',
+        ]
+        if eta is not None:
+            lines.append('# TYPE tlog_harvester_eta_seconds gauge')
+            lines.append(f'tlog_harvester_eta_seconds{labels} {eta:.3f}')
+        # Write aside and rename so a scraper never sees a partial file
+        tmp_file = self.metrics_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as outfile:
+            outfile.write('\n'.join(lines) + '\n')
+        os.replace(tmp_file, self.metrics_file)
+
+    def status_interval(self):
+        return _my_tty_interval if self.is_tty else _my_log_interval
+
+    def _report(self, final=False):
+        # The status line and the metrics file have their own rates
+        now = time.monotonic()
+        if not self.quiet:
+            if final or now - self._last_status >= self.status_interval():
+                self._last_status = now
+                if self.is_tty:
+                    end = '\n' if final else ''
+                    print('\r' + self.status_line() + '\033[K', end=end,
+                          file=sys.stderr, flush=True)
+                else:
+                    print(self.status_line(), file=sys.stderr, flush=True)
+        if self.metrics_file:
+            if final or now - self._last_metrics >= _my_metrics_interval:
+                self._last_metrics = now
+                self.write_metrics()
+
+    def _run(self):
+        interval = _my_metrics_interval
+        if not self.quiet:
+            interval = min(interval, self.status_interval())
+        while not self._stop.wait(interval):
+            self._report()
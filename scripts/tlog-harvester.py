@@ -2,12 +2,10 @@
 #
 #----------------------------------------------------------------------
 
-import argparse
-import json
 import os
-from   pathlib import Path
 import sys
-import textwrap
+
+from   progress import Progress
 
 _my_name = os.path.basename(__file__)
 _my_output_default = 'tlogs.json'
@@ -26,6 +24,9 @@ Examples:
 
 #-------------------------------------------------------------------------------
 def get_my_arg_parser():
+    import argparse
+    import textwrap
+
     parser = argparse.ArgumentParser(_my_name,
         formatter_class=argparse.RawDescriptionHelpFormatter,
         description=textwrap.dedent(DESCRIPTION),
@@ -47,6 +48,8 @@ def get_my_arg_parser():
     add('-o', '--output', metavar='OUTFILE',
         default=_my_output_default,
         help='output file (.po or .pot) with results')
+    add('-m', '--metrics', metavar='METRICSFILE',
+        help='periodically write Prometheus style metrics to this file')
 
     return parser
 
@@ -54,6 +57,8 @@ def get_my_arg_parser():
 #
 #-------------------------------------------------------------------------------
 def save_as_json(file_name, content):
+    import json
+
     with open(file_name, 'w', encoding='utf-8') as outfile:
         json.dump(content, outfile, indent=2, ensure_ascii=False)
 
@@ -61,6 +66,8 @@ def save_as_json(file_name, content):
 #
 #-------------------------------------------------------------------------------
 def open_as_json(file_name):
+    import json
+
     with open(file_name, 'r', encoding='utf-8') as json_file:
         content = json.load(json_file)
 
@@ -79,6 +86,8 @@ def has_valid_text(the_string):
 
 #-------------------------------------------------------------------------------
 def glob_pattern_files(in_dir, pattern):
+    from pathlib import Path
+
     the_dir = Path(in_dir)
 #   print(f'Looking in {the_dir}')
     glob_files = []
@@ -110,12 +119,16 @@ def parse_one_tlog_file(tlog_file):
     return commands
 
 #-------------------------------------------------------------------------------
-def parse_tlog_files(globbed_files):
+def parse_tlog_files(globbed_files, options):
     command_lines = {}
-    for file in globbed_files:
-#        print(f'{file = }')
-        tlog_output = parse_one_tlog_file(file)
-        command_lines[file] = tlog_output
+    with Progress('tlog-harvester', len(globbed_files), options.quiet,
+                  options.metrics) as progress:
+        for file in globbed_files:
+#            print(f'{file = }')
+            progress.started()
+            tlog_output = parse_one_tlog_file(file)
+            command_lines[file] = tlog_output
+            progress.finished()
 
     return command_lines
 
@@ -146,7 +159,7 @@ def main():
         return 1
 
     no_tlog_dirs = len(tlogs)
-    results = parse_tlog_files(tlogs)
+    results = parse_tlog_files(tlogs, options)
     if not results:
         print(f'No logs found')
         return 1
@@ -2,12 +2,10 @@
 #
 #----------------------------------------------------------------------
 
-import argparse
-import json
 import os
-from   pathlib import Path
 import sys
-import textwrap
+
+from   cmdsdb import args_key, tlog_configurations, tlog_project
 
 _my_name = os.path.basename(__file__)
 _my_input_default = 'tlogs.json'
@@ -25,6 +23,9 @@ Examples:
 
 #-------------------------------------------------------------------------------
 def parse_arguments():
+    import argparse
+    import textwrap
+
     parser = argparse.ArgumentParser(_my_name,
         formatter_class=argparse.RawDescriptionHelpFormatter,
         description=textwrap.dedent(DESCRIPTION),
@@ -41,6 +42,8 @@ def parse_arguments():
     add('-o', '--output', metavar='OUTFILE',
         default=_my_output_default,
         help='output file')
+    add('-s', '--snapshot', metavar='SNAPSHOTFILE',
+        help='also save a binary snapshot for fast reload, e.g. cmds.cdb')
 
     options = parser.parse_args()
     if not os.path.exists(options.input):
@@ -51,11 +54,15 @@ def parse_arguments():
 
 #-------------------------------------------------------------------------------
 def save_as_json(file_name, content):
+    import json
+
     with open(file_name, 'w', encoding='utf-8') as outfile:
         json.dump(content, outfile, indent=2, ensure_ascii=False)
 
 #-------------------------------------------------------------------------------
 def open_as_json(file_name):
+    import json
+
     with open(file_name, 'r', encoding='utf-8') as json_file:
         content = json.load(json_file)
 
@@ -102,16 +109,55 @@ def extract_output_dir(cmd_line):
     return output_dir
 
 #-------------------------------------------------------------------------------
-def extract_source_file(cmd_line):
-    source_file_name = ""
+def split_cmd_line(cmd_line, stop_index):
+    tokens = []
     curr_index = 0
+    while curr_index < stop_index:
+        while curr_index < stop_index and cmd_line[curr_index].isspace():
+            curr_index += 1
+        if curr_index == stop_index:
+            break
+        start_index = curr_index
+        quoted = False
+        while curr_index < stop_index:
+            curr_char = cmd_line[curr_index]
+            if curr_char == '"':
+                quoted = not quoted
+            elif curr_char.isspace() and not quoted:
+                break
+            curr_index += 1
+        tokens.append(cmd_line[start_index:curr_index])
+    return tokens
+
+#-------------------------------------------------------------------------------
+# Options that may have their value as the next token, e.g. "/D FOO" or "/I dir"
+_my_separated_options = ('/D', '/I', '/U', '/FI', '/FU', '/AI',
+                         '/external:I', '/external:env', '/reference',
+                         '/headerUnit', '/sourceDependencies',
+                         '/sourceDependencies:directives', '/ifcOutput',
+                         '/ifcSearchDir')
+
+def extract_source_files(cmd_line):
     stop_index = len(cmd_line)
     # First skip the \n" ending
     end_index = cmd_line.rfind('\n"', 0, stop_index)
-    start_index = cmd_line.rfind(' ', 0, end_index)
-    source_file_name = cmd_line[start_index:end_index]
-
-    return source_file_name
+    if end_index == -1:
+        end_index = stop_index
+    tokens = split_cmd_line(cmd_line, end_index)
+    # The source files are the trailing tokens that are not options, there is
+    # more than one when cl is given a batch (/MP, unity builds)
+    first_index = len(tokens)
+    while first_index > 0:
+        token = tokens[first_index - 1]
+        if token.startswith(('/', '-')) and not os.path.isfile(token):
+            break
+        # A directory is never a source, it is the value of some option
+        if os.path.isdir(token.strip('"')):
+            break
+        if first_index > 1 and tokens[first_index - 2] in _my_separated_options:
+            break
+        first_index -= 1
+    return tokens[first_index:]
 
 #-------------------------------------------------------------------------------
 def normalize_path(tlog_path, allow_non_existing=False):
@@ -141,13 +187,7 @@ def normalize_path_list(tlog_path_list):
     return canonical_path_list
 
 #-------------------------------------------------------------------------------
-def handle_source_file(cmd_line, tlog_dir):
-    raw_source_file = extract_source_file(cmd_line)
-    if len(raw_source_file) == 0:
-        print(f'Could not find the source file in this line:')
-        print(f'{cmd_line}')
-        print(f'  (coming from {tlog_dir})')
-        return None
+def handle_source_file(raw_source_file):
     source_file = normalize_path(raw_source_file)
     if source_file:
         return source_file
@@ -159,23 +199,67 @@ def handle_source_file(cmd_line, tlog_dir):
         return None
     return source_file
 
+#-------------------------------------------------------------------------------
+def handle_source_files(cmd_line, tlog_dir):
+    raw_source_files = extract_source_files(cmd_line)
+    if len(raw_source_files) == 0:
+        print(f'Could not find the source file in this line:')
+        print(f'{cmd_line}')
+        print(f'  (coming from {tlog_dir})')
+        return []
+    source_files = []
+    for raw_source_file in raw_source_files:
+        source_file = handle_source_file(raw_source_file)
+        if source_file:
+            source_files.append(source_file)
+    return source_files
 
 #-------------------------------------------------------------------------------
 def process_line(cmd_line, tlog_dir):
     commands = {}
+    source_files = handle_source_files(cmd_line, tlog_dir)
+    if not source_files:
+        return commands
+
+    # Parse the flags once, all sources of a batched cl call share them
     content = {}
-    defines = extract_from_pattern(cmd_line, ' /D')
-    includes = normalize_path_list(extract_from_pattern(cmd_line, ' /I'))
-    out_dir = normalize_path(extract_output_dir(cmd_line), allow_non_existing=True)
-    source_file = handle_source_file(cmd_line, tlog_dir)
-    if source_file:
-        content['defines'] = defines
-        content['includes'] = includes
-        content['out_dir'] = out_dir
+    content['defines'] = extract_from_pattern(cmd_line, ' /D')
+    content['includes'] = normalize_path_list(extract_from_pattern(cmd_line, ' /I'))
+    content['out_dir'] = normalize_path(extract_output_dir(cmd_line), allow_non_existing=True)
+    content['tlog'] = tlog_dir
+    for source_file in source_files:
         commands[source_file] = content
 
     return commands
 
+#-------------------------------------------------------------------------------
+def dedup_commands(command_lines):
+    deduped_lines = []
+    seen = set()
+    keys = {}
+    no_duplicates = 0
+    for commands in command_lines:
+        kept = {}
+        for source_file, args in commands.items():
+            # Sources of a batched line share args, only normalize them once
+            key = keys.get(id(args))
+            if key is None:
+                # The same TU in two projects or configurations is kept for each
+                # so that both are found by the queries
+                tlog = args.get('tlog') or ''
+                key = (args_key(args), tlog_project(tlog),
+                       tuple(tlog_configurations(tlog)))
+                keys[id(args)] = key
+            tu_key = (source_file, key)
+            if tu_key in seen:
+                no_duplicates += 1
+                continue
+            seen.add(tu_key)
+            kept[source_file] = args
+        if kept:
+            deduped_lines.append(kept)
+    return deduped_lines, no_duplicates
+
 #-------------------------------------------------------------------------------
 def process_tlogs(json_file):
     content = open_as_json(json_file)
@@ -199,10 +283,19 @@ def main(options):
         print(f'No logs found')
         return 1
 
+    results, no_duplicates = dedup_commands(results)
+    if no_duplicates and not options.quiet:
+        print(f'{no_duplicates} duplicate translation units dropped')
+
     result_file = options.output
     save_as_json(result_file, results)
     print(f'{len(results)} command lines')
     print(f'Results saved in {result_file}')
+    if options.snapshot:
+        from cmdsdb import save_snapshot
+
+        save_snapshot(options.snapshot, results)
+        print(f'Snapshot saved in {options.snapshot}')
 
     return ret_val
 
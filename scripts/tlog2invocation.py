@@ -2,12 +2,10 @@
 #
 #----------------------------------------------------------------------
 
-import argparse
-import json
 import os
-from   pathlib import Path
 import sys
-import textwrap
+
+from   cmdsdb import open_commands, query_commands
 
 _my_name = os.path.basename(__file__)
 _my_input_default = 'cmds.json'
@@ -25,6 +23,9 @@ Examples:
 
 #-------------------------------------------------------------------------------
 def parse_arguments():
+    import argparse
+    import textwrap
+
     parser = argparse.ArgumentParser(_my_name,
         formatter_class=argparse.RawDescriptionHelpFormatter,
         description=textwrap.dedent(DESCRIPTION),
@@ -42,13 +43,21 @@ def parse_arguments():
         help='be more verbose')
     add('-i', '--input', metavar='INFILE',
         default=_my_input_default,
-        help='input file (.json)')
+        help='input file (.json or snapshot)')
     add('-o', '--output', metavar='OUTFILE',
         default=_my_output_default,
         help='output file')
     add('-e', '--executable', metavar='THE APP',
         default=_my_exe_default,
         help='called executable')
+    add('--project', metavar='PROJECT',
+        help='only the commands of this project')
+    add('--config', metavar='CONFIGURATION',
+        help='only the commands of this configuration, e.g. Release or x64')
+    add('--source', metavar='SOURCE-GLOB',
+        help='only the commands of source files matching this glob')
+    add('--define', metavar='DEFINE',
+        help='only the commands with this define, NAME or NAME=VALUE')
 
     options = parser.parse_args()
     if not os.path.exists(options.input):
@@ -59,32 +68,32 @@ def parse_arguments():
 
 #-------------------------------------------------------------------------------
 def save_as_json(file_name, content):
+    import json
+
     with open(file_name, 'w', encoding='utf-8') as outfile:
         json.dump(content, outfile, indent=2, ensure_ascii=False)
 
 #-------------------------------------------------------------------------------
-def open_as_json(file_name):
-    with open(file_name, 'r', encoding='utf-8') as json_file:
-        content = json.load(json_file)
-
-    return content
-
-#-------------------------------------------------------------------------------
-def process_tlogcmds(json_file, app):
-    content = open_as_json(json_file)
+def process_tlogcmds(json_file, app, options):
     argument_lines = []
-    for invocation in content:
-        for source_file in invocation.keys():
-            argument_line = f'{app} --source_file {source_file}'
-            args = invocation[source_file]
-            for define in args['defines']:
-                argument_line += f' -D{define}'
-            for include in args['includes']:
-                argument_line += f' --include {include}'
-            out_dir = args.get('out_dir')
-            if out_dir:
-                argument_line += f' --out_dir {out_dir}'
-            argument_lines.append(argument_line)
+    with open_commands(json_file) as commands:
+        content = query_commands(commands,
+                                 project=options.project,
+                                 source=options.source,
+                                 define=options.define,
+                                 configuration=options.config)
+        for invocation in content:
+            for source_file in invocation.keys():
+                argument_line = f'{app} --source_file {source_file}'
+                args = invocation[source_file]
+                for define in args['defines']:
+                    argument_line += f' -D{define}'
+                for include in args['includes']:
+                    argument_line += f' --include {include}'
+                out_dir = args.get('out_dir')
+                if out_dir:
+                    argument_line += f' --out_dir {out_dir}'
+                argument_lines.append(argument_line)
 
     return argument_lines
 
@@ -95,7 +104,7 @@ def main(options):
     infile = options.input
     caller = options.executable
 
-    results = process_tlogcmds(infile, caller)
+    results = process_tlogcmds(infile, caller, options)
     if not results:
         print(f'No input found')
         return 1
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+#
+#----------------------------------------------------------------------
+#
+# Single entry point for the pipeline scripts:
+#   python -m tlog_harvester <stage> [stage options]
+#
+# The stage script is imported rather than run as __main__, so Python keeps
+# its byte code in __pycache__ and only the stage that is run gets loaded.
+#----------------------------------------------------------------------
+
+import os
+import sys
+
+_my_scripts_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = {
+    'harvest': 'tlog-harvester.py',
+    'cmd': 'tlog2cmd.py',
+    'ninja': 'cmds2ninja.py',
+    'invocation': 'tlog2invocation.py',
+    'invoke': 'invocater.py',
+}
+
+#-------------------------------------------------------------------------------
+def usage():
+    print(f'Usage: python -m tlog_harvester <stage> [options]')
+    print(f'Stages:')
+    for stage, script in STAGES.items():
+        print(f'  {stage:<12}{script}')
+
+#-------------------------------------------------------------------------------
+def load_stage(stage):
+    import importlib.util
+
+    script = os.path.join(_my_scripts_dir, STAGES[stage])
+    # The stage scripts import their siblings (progress, cmdsdb)
+    if _my_scripts_dir not in sys.path:
+        sys.path.insert(0, _my_scripts_dir)
+    module_name = 'tlog_harvester_' + stage
+    spec = importlib.util.spec_from_file_location(module_name, script)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+#-------------------------------------------------------------------------------
+def main(argv):
+    if not argv or argv[0] not in STAGES:
+        usage()
+        return 0 if argv and argv[0] in ('-h', '--help') else 3
+
+    stage = argv[0]
+    module = load_stage(stage)
+    # Let the stage parse its own options as if it was run directly
+    sys.argv = [module.__file__] + argv[1:]
+    if hasattr(module, 'parse_arguments'):
+        return module.main(module.parse_arguments())
+    return module.main()
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+#
+#----------------------------------------------------------------------
+
+import sys
+
+from   tlog_harvester import main
+
+#-------------------------------------------------------------------------------
+#
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+#
+#----------------------------------------------------------------------
+
+import os
+import sys
+
+# The pipeline scripts import their siblings from the scripts directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'scripts'))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+#
+#----------------------------------------------------------------------
+
+import os
+from   types import SimpleNamespace
+
+from   cmds2ninja import dedup_invocations, generate_ninja_file, save_conflicts
+from   cmdsdb import args_key
+
+#-------------------------------------------------------------------------------
+def make_args(defines, out_dir='out'):
+    return {'defines': defines, 'includes': ['inc'], 'out_dir': out_dir}
+
+#-------------------------------------------------------------------------------
+def test_args_key_define_order():
+    assert args_key(make_args(['A', 'B'])) == args_key(make_args(['B', 'A']))
+    # The last /D of a name wins in cl
+    assert args_key(make_args(['X=1', 'X=2'])) != args_key(make_args(['X=2', 'X=1']))
+
+#-------------------------------------------------------------------------------
+def test_identical_rules_are_merged():
+    rules, conflicts = dedup_invocations([
+        {'a/x.cpp': make_args(['A', 'B'])},
+        {'a/x.cpp': make_args(['B', 'A'])},
+    ])
+    assert list(rules) == [os.path.join('out', 'x.cpp.indx')]
+    assert conflicts == {}
+
+#-------------------------------------------------------------------------------
+def test_conflicts_do_not_depend_on_input_order():
+    first = {'b/x.cpp': make_args(['A'])}
+    second = {'a/x.cpp': make_args(['A'])}
+    for json_input in ([first, second], [second, first]):
+        rules, conflicts = dedup_invocations(json_input)
+        (out_file, (src_file, _)), = rules.items()
+        assert src_file == 'a/x.cpp'
+        assert [src for src, _ in conflicts[out_file]] == ['b/x.cpp']
+
+#-------------------------------------------------------------------------------
+def test_save_conflicts(tmp_path):
+    rules, conflicts = dedup_invocations([
+        {'b/x.cpp': make_args(['A'])},
+        {'a/x.cpp': make_args(['A'])},
+    ])
+    conflict_file = tmp_path / 'conflicts.txt'
+    save_conflicts(str(conflict_file), rules, conflicts)
+    lines = conflict_file.read_text(encoding='utf-8').splitlines()
+    assert lines[1].startswith('  kept:    a/x.cpp')
+    assert lines[2].startswith('  skipped: b/x.cpp')
+
+#-------------------------------------------------------------------------------
+def test_conflict_file_only_written_on_conflicts(tmp_path):
+    conflict_file = tmp_path / 'conflicts.txt'
+    conflict_file.write_text('from somewhere else', encoding='utf-8')
+    options = SimpleNamespace(conflicts=str(conflict_file))
+    ninja_file = str(tmp_path / 'build.ninja')
+    generate_ninja_file([{'a/x.cpp': make_args(['A'])}], 'tool', ninja_file, options)
+    assert conflict_file.read_text(encoding='utf-8') == 'from somewhere else'
+    assert 'COMPILE a/x.cpp' in open(ninja_file).read()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+#
+#----------------------------------------------------------------------
+
+import pytest
+
+from   cmdsdb import CommandList, CommandSnapshot, query_commands, \
+                     save_snapshot, tlog_configurations, tlog_project
+
+_my_app_tlog = 'D:\\build\\app\\x64\\Release\\app.tlog\\CL.command.1.tlog'
+_my_lib_tlog = 'D:\\build\\lib\\Debug\\lib.tlog\\CL.command.1.tlog'
+
+#-------------------------------------------------------------------------------
+def make_commands():
+    release = {'defines': ['NDEBUG', 'VER=2'], 'includes': ['D:\\src\\inc'],
+               'out_dir': 'D:\\build\\app\\x64\\Release\\', 'tlog': _my_app_tlog}
+    debug = {'defines': ['_DEBUG', 'VER=1'], 'includes': [],
+             'out_dir': None, 'tlog': _my_lib_tlog}
+    return [
+        {'D:\\src\\app\\main.cpp': release, 'D:\\src\\app\\util.cpp': release},
+        {'D:\\src\\lib\\c.cpp': debug},
+    ]
+
+#-------------------------------------------------------------------------------
+@pytest.fixture(params=['json', 'snapshot'])
+def commands(request, tmp_path):
+    if request.param == 'json':
+        yield CommandList(make_commands())
+        return
+    snapshot_file = str(tmp_path / 'cmds.cdb')
+    save_snapshot(snapshot_file, make_commands())
+    with CommandSnapshot(snapshot_file) as snapshot:
+        yield snapshot
+
+#-------------------------------------------------------------------------------
+def sources(selected):
+    return sorted(source_file for tu in selected for source_file in tu)
+
+#-------------------------------------------------------------------------------
+def test_tlog_configurations():
+    assert tlog_configurations(_my_app_tlog) == ['build', 'app', 'x64', 'Release']
+    assert tlog_configurations(_my_lib_tlog) == ['build', 'lib', 'Debug']
+
+#-------------------------------------------------------------------------------
+def test_tlog_project():
+    assert tlog_project(_my_app_tlog) == 'app'
+    assert tlog_project('D:\\obj\\MyVeryLongProj.1A2B3C4D.tlog\\CL.command.1.tlog') == \
+        'MyVeryLongProj'
+
+#-------------------------------------------------------------------------------
+_my_layouts = {
+    'D:\\obj\\x64\\Release\\one\\one.tlog\\CL.command.1.tlog': 'D:\\src\\one.cpp',
+    'D:\\obj\\Release\\x64\\two.tlog\\CL.command.1.tlog': 'D:\\src\\two.cpp',
+    'D:\\obj\\Debug\\MyVeryLongProj.1A2B3C4D.tlog\\CL.command.1.tlog': 'D:\\src\\three.cpp',
+}
+
+@pytest.fixture(params=['json', 'snapshot'])
+def layouts(request, tmp_path):
+    command_lines = [{source_file: {'defines': [], 'includes': [],
+                                    'out_dir': None, 'tlog': tlog}}
+                     for tlog, source_file in _my_layouts.items()]
+    if request.param == 'json':
+        yield CommandList(command_lines)
+        return
+    snapshot_file = str(tmp_path / 'layouts.cdb')
+    save_snapshot(snapshot_file, command_lines)
+    with CommandSnapshot(snapshot_file) as snapshot:
+        yield snapshot
+
+@pytest.mark.parametrize('query, expected', [
+    ({'configuration': 'release'}, ['D:\\src\\one.cpp', 'D:\\src\\two.cpp']),
+    ({'configuration': 'x64'}, ['D:\\src\\one.cpp', 'D:\\src\\two.cpp']),
+    ({'configuration': 'Debug'}, ['D:\\src\\three.cpp']),
+    ({'project': 'one'}, ['D:\\src\\one.cpp']),
+    ({'project': 'MyVeryLongProject'}, ['D:\\src\\three.cpp']),
+    ({'project': 'MyVeryLong'}, []),
+])
+def test_query_layouts(layouts, query, expected):
+    assert sources(query_commands(layouts, **query)) == expected
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize('query, expected', [
+    ({}, ['D:\\src\\app\\main.cpp', 'D:\\src\\app\\util.cpp', 'D:\\src\\lib\\c.cpp']),
+    ({'project': 'APP'}, ['D:\\src\\app\\main.cpp', 'D:\\src\\app\\util.cpp']),
+    ({'configuration': 'debug'}, ['D:\\src\\lib\\c.cpp']),
+    ({'configuration': 'x64'}, ['D:\\src\\app\\main.cpp', 'D:\\src\\app\\util.cpp']),
+    ({'configuration': 'nightly'}, []),
+    ({'define': 'VER'}, ['D:\\src\\app\\main.cpp', 'D:\\src\\app\\util.cpp', 'D:\\src\\lib\\c.cpp']),
+    ({'define': 'VER=1'}, ['D:\\src\\lib\\c.cpp']),
+    ({'define': 'VER=2', 'project': 'lib'}, []),
+    ({'source': 'D:\\src\\app\\m*.cpp'}, ['D:\\src\\app\\main.cpp']),
+    ({'source': 'D:/src/*/c.cpp'}, ['D:\\src\\lib\\c.cpp']),
+    ({'source': '*.cpp', 'project': 'lib'}, ['D:\\src\\lib\\c.cpp']),
+    ({'source': 'util.cpp'}, ['D:\\src\\app\\util.cpp']),
+    ({'source': 'lib\\c.cpp'}, ['D:\\src\\lib\\c.cpp']),
+])
+def test_query_commands(commands, query, expected):
+    assert sources(query_commands(commands, **query)) == expected
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+#
+#----------------------------------------------------------------------
+
+import os
+import signal
+import subprocess
+import sys
+from   types import SimpleNamespace
+
+import pytest
+
+import invocater
+from   invocater import exit_status, run_process, run_with_retries
+
+_my_python = f'"{sys.executable}"'
+
+posix_only = pytest.mark.skipif(os.name == 'nt', reason='needs a POSIX shell')
+
+#-------------------------------------------------------------------------------
+@pytest.fixture(autouse=True)
+def known_codepage(monkeypatch):
+    # Do not ask cmd for the code page
+    monkeypatch.setattr(invocater.ccp, 'codepage', 'utf-8', raising=False)
+
+#-------------------------------------------------------------------------------
+def make_options(**kwargs):
+    options = dict(timeout=None, retries=0, retry_delay=0.0,
+                   max_memory=None, max_cpu=None)
+    options.update(kwargs)
+    return SimpleNamespace(**options)
+
+#-------------------------------------------------------------------------------
+def test_exit_status():
+    assert exit_status(1, False) == 'failed'
+    assert exit_status(124, True) == 'failed'
+    assert exit_status(128 + signal.SIGSEGV, True) == 'signal'
+    assert exit_status(-signal.SIGKILL, False) == 'signal'
+    assert exit_status(-signal.SIGKILL, True) == 'limited'
+
+#-------------------------------------------------------------------------------
+def test_ok():
+    reply, exit_code, status = run_process(f'{_my_python} -c "print(42)"', True)
+    assert (reply.strip(), exit_code, status) == ('42', 0, 'ok')
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize('code', [1, 124, 126])
+def test_exit_codes_are_not_timeouts(code):
+    # Only the exception says that a job timed out or did not start
+    reply, exit_code, status, retries = run_with_retries(
+        f'{_my_python} -c "raise SystemExit({code})"', make_options(timeout=30, retries=2))
+    assert (exit_code, status, retries) == (code, 'failed', 0)
+
+#-------------------------------------------------------------------------------
+def test_timeout_is_retried():
+    reply, exit_code, status, retries = run_with_retries(
+        f'{_my_python} -c "import time; time.sleep(30)"',
+        make_options(timeout=0.5, retries=1))
+    assert (exit_code, status, retries) == (None, 'timeout', 1)
+
+#-------------------------------------------------------------------------------
+def test_not_started_is_retried(monkeypatch):
+    def no_popen(*args, **kwargs):
+        raise OSError('no more processes')
+    monkeypatch.setattr(subprocess, 'Popen', no_popen)
+    reply, exit_code, status, retries = run_with_retries('anything',
+                                                         make_options(retries=2))
+    assert (exit_code, status, retries) == (None, 'not started', 2)
+
+#-------------------------------------------------------------------------------
+@posix_only
+def test_cpu_limit_is_limited():
+    reply, exit_code, status = run_process(f'{_my_python} -c "while True: pass"',
+                                           True, timeout=30, max_cpu=1)
+    assert status == 'limited'
+
+#-------------------------------------------------------------------------------
+@posix_only
+def test_crash_is_signal():
+    command = f'{_my_python} -c "import os, signal; os.kill(os.getpid(), signal.SIGSEGV)"'
+    reply, exit_code, status = run_process(command, True, max_cpu=10)
+    assert status == 'signal'
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+#
+#----------------------------------------------------------------------
+
+import time
+
+import progress
+from   progress import Progress, format_duration
+
+#-------------------------------------------------------------------------------
+def test_format_duration():
+    assert format_duration(5) == '0:05'
+    assert format_duration(125) == '2:05'
+    assert format_duration(3725) == '1:02:05'
+
+#-------------------------------------------------------------------------------
+def test_counters_and_status_line():
+    the_progress = Progress('stage', 3, quiet=True)
+    the_progress.started()
+    the_progress.started()
+    the_progress.finished()
+    the_progress.finished(failed=True)
+    the_progress.started()
+    done, failed, in_flight, _, _, _ = the_progress.snapshot()
+    assert (done, failed, in_flight) == (2, 1, 1)
+    line = the_progress.status_line()
+    assert line.startswith('stage: 2/3 done, 1 failed')
+    assert '1 in flight' in line
+
+#-------------------------------------------------------------------------------
+def test_metrics_names(tmp_path):
+    metrics_file = tmp_path / 'metrics.prom'
+    with Progress('stage', 2, quiet=True, metrics_file=str(metrics_file)) as the_progress:
+        the_progress.started()
+        the_progress.finished(failed=True)
+    metrics = {}
+    for line in metrics_file.read_text(encoding='utf-8').splitlines():
+        if line.startswith('# TYPE'):
+            _, _, name, kind = line.split()
+            metrics[name] = kind
+    # Counters and only counters end in _total
+    for name, kind in metrics.items():
+        assert name.endswith('_total') == (kind == 'counter'), name
+    assert 'tlog_harvester_items_done_total{stage="stage"} 1' in \
+        metrics_file.read_text(encoding='utf-8')
+
+#-------------------------------------------------------------------------------
+def test_quiet_metrics_follow_metrics_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(progress, '_my_log_interval', 60.0)
+    monkeypatch.setattr(progress, '_my_tty_interval', 60.0)
+    monkeypatch.setattr(progress, '_my_metrics_interval', 0.05)
+    metrics_file = tmp_path / 'metrics.prom'
+    with Progress('stage', 2, quiet=True, metrics_file=str(metrics_file)) as the_progress:
+        the_progress.started()
+        the_progress.finished()
+        deadline = time.monotonic() + 5
+        while not metrics_file.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert metrics_file.exists()
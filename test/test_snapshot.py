@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+#
+#----------------------------------------------------------------------
+
+import json
+
+import pytest
+
+from   cmdsdb import CommandList, CommandSnapshot, open_commands, save_snapshot
+
+#-------------------------------------------------------------------------------
+def make_commands():
+    batched = {'defines': ['NDEBUG', 'NAME="ü"'], 'includes': ['D:\\src\\inc'],
+               'out_dir': 'D:\\build\\Release\\', 'tlog': 'D:\\build\\Release\\app.tlog\\CL.command.1.tlog'}
+    single = {'defines': [], 'includes': [], 'out_dir': None}
+    return [
+        {'D:\\src\\main.cpp': batched, 'D:\\src\\util.cpp': batched},
+        {'D:\\src\\c.cpp': single},
+    ]
+
+#-------------------------------------------------------------------------------
+@pytest.fixture
+def input_files(tmp_path):
+    json_file = str(tmp_path / 'cmds.json')
+    snapshot_file = str(tmp_path / 'cmds.cdb')
+    with open(json_file, 'w', encoding='utf-8') as outfile:
+        json.dump(make_commands(), outfile)
+    save_snapshot(snapshot_file, make_commands())
+    return json_file, snapshot_file
+
+#-------------------------------------------------------------------------------
+def test_snapshot_matches_json(input_files):
+    json_file, snapshot_file = input_files
+    with open_commands(json_file) as from_json:
+        assert isinstance(from_json, CommandList)
+        expected = list(from_json)
+    with open_commands(snapshot_file) as snapshot:
+        assert isinstance(snapshot, CommandSnapshot)
+        assert len(snapshot) == 3
+        assert list(snapshot) == expected
+        # Batched sources share one flag set
+        assert snapshot.args(0) is snapshot.args(1)
+
+#-------------------------------------------------------------------------------
+def test_snapshot_is_closed(input_files):
+    _, snapshot_file = input_files
+    with open_commands(snapshot_file) as snapshot:
+        list(snapshot)
+    assert snapshot._map.closed
+    assert snapshot._file.closed
+
+#-------------------------------------------------------------------------------
+def test_not_a_snapshot(tmp_path):
+    other_file = tmp_path / 'other.cdb'
+    other_file.write_bytes(b'TLOGCDB\0' + bytes(64))
+    with pytest.raises(ValueError):
+        CommandSnapshot(str(other_file))
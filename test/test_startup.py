@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+#
+#----------------------------------------------------------------------
+#
+# Startup budget for the pipeline stages, measured with -X importtime
+#
+#----------------------------------------------------------------------
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+_my_scripts_dir = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'scripts')
+_my_stages = ['harvest', 'cmd', 'ninja', 'invocation', 'invoke']
+# Sum of the top level cumulative import times, in microseconds
+_my_budget_us = int(os.environ.get('TLOG_HARVESTER_STARTUP_BUDGET_US', 100000))
+# Only imported when the stage gets to do real work
+_my_lazy_modules = ['json', 'pathlib', 'concurrent.futures']
+
+#-------------------------------------------------------------------------------
+def import_times(stage):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = _my_scripts_dir
+    status = subprocess.run([sys.executable, '-X', 'importtime',
+                             '-m', 'tlog_harvester', stage, '--help'],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            text=True,
+                            env=env)
+    assert status.returncode == 0, status.stderr
+
+    times = {}
+    for line in status.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line.split('|')
+        cumulative = cumulative.strip()
+        if not cumulative.isdigit():
+            continue  # The header line
+        # Nested imports are indented, keep the top level ones
+        times[name.rstrip()] = int(cumulative)
+    return times
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize('stage', _my_stages)
+def test_startup_budget(stage):
+    times = import_times(stage)
+    top_level = sum(cumulative for name, cumulative in times.items()
+                    if not name.startswith('  '))
+    assert top_level <= _my_budget_us, \
+        f'{stage} spends {top_level} us importing, budget is {_my_budget_us} us'
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize('stage', _my_stages)
+def test_no_eager_heavy_imports(stage):
+    imported = {name.strip() for name in import_times(stage)}
+    assert not imported.intersection(_my_lazy_modules)
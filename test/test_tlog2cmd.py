@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+#
+#----------------------------------------------------------------------
+
+from   tlog2cmd import dedup_commands, extract_source_files, \
+                     handle_source_file, process_line
+
+_my_tlog = 'D:\\build\\{0}\\Release\\{0}.tlog\\CL.command.1.tlog'
+
+#-------------------------------------------------------------------------------
+def test_extract_source_files():
+    assert extract_source_files('/c /DFOO /MP a.cpp "b c.cpp" d.cpp\n') == \
+        ['a.cpp', '"b c.cpp"', 'd.cpp']
+    assert extract_source_files('/c /I inc /external:I ext a.cpp\n') == ['a.cpp']
+    assert extract_source_files('/c /sourceDependencies deps\n') == []
+
+#-------------------------------------------------------------------------------
+def test_extract_source_files_stops_at_directory(tmp_path):
+    (tmp_path / 'a.cpp').touch()
+    assert extract_source_files(f'/c /unknownOption {tmp_path} a.cpp\n') == ['a.cpp']
+
+#-------------------------------------------------------------------------------
+def test_handle_source_file(tmp_path):
+    a_file = tmp_path / 'a.cpp'
+    a_file.touch()
+    assert handle_source_file(str(a_file)) == str(a_file)
+    assert handle_source_file(f'"{a_file}"') == f'"{a_file}"'
+    assert handle_source_file(str(tmp_path / 'missing.cpp')) is None
+
+#-------------------------------------------------------------------------------
+def test_process_line_shares_flags(tmp_path):
+    a_file = tmp_path / 'a.cpp'
+    b_file = tmp_path / 'b.cpp'
+    a_file.touch()
+    b_file.touch()
+    commands = process_line(f'/c /DFOO /Foout\\ {a_file} {b_file}\n',
+                            _my_tlog.format('app'))
+    assert sorted(commands) == [str(a_file), str(b_file)]
+    assert commands[str(a_file)] is commands[str(b_file)]
+    assert commands[str(a_file)]['defines'] == ['FOO']
+
+#-------------------------------------------------------------------------------
+def test_dedup_keeps_each_project():
+    def args(project, defines):
+        return {'defines': defines, 'includes': [], 'out_dir': None,
+                'tlog': _my_tlog.format(project)}
+    command_lines = [
+        {'c.cpp': args('projA', ['A', 'B'])},
+        {'c.cpp': args('projA', ['B', 'A'])},
+        {'c.cpp': args('projB', ['A', 'B'])},
+    ]
+    deduped, no_duplicates = dedup_commands(command_lines)
+    assert no_duplicates == 1
+    assert [tu['c.cpp']['tlog'] for tu in deduped] == \
+        [_my_tlog.format('projA'), _my_tlog.format('projB')]